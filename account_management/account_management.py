@@ -15,6 +15,7 @@ import argparse
 import datetime
 import logging
 import sys
+import urllib.parse
 
 import redfish
 import redfish_utilities
@@ -22,7 +23,13 @@ import redfish_utilities
 import toolspath
 from usecase.results import Results
 
-def verify_user( context, user_name, role = None, enabled = None ):
+# Tests that require the test user to be added
+USER_TESTS = ( "Enable User", "Credential Check", "Change Role", "Delete User" )
+
+# Passwords to try for the test user; multiple are needed in case the service has password requirements that cannot be detected
+TEST_PASSWORDS = ( "hUPgd9Z4", "7jIl3dn!kd0Fql", "m5Ljed3!n0olvdS*m0kmWER15!" )
+
+def verify_user( context, user_name, role = None, enabled = None, users = None ):
     """
     Checks that a given user is in the user list with a certain role
 
@@ -31,20 +38,45 @@ def verify_user( context, user_name, role = None, enabled = None ):
         user_name: The name of the user to check
         role: The role for the user
         enabled: The enabled state for the user
+        users: The users to check, keyed by user name; if not provided, the users are read from the service
 
     Returns:
         True if a match is found, false otherwise
     """
-    user_list = redfish_utilities.get_users( context )
-    for user in user_list:
-        if user["UserName"] == user_name:
-            if role is not None and user["RoleId"] != role:
-                return False
-            if enabled is not None and user["Enabled"] != enabled:
-                return False
-            return True
+    if users is None:
+        users = get_user_index( context )
+    user = users.get( user_name )
+    if user is None:
+        return False
+    if role is not None and user["RoleId"] != role:
+        return False
+    if enabled is not None and user.get( "Enabled", True ) != enabled:
+        return False
+    return True
+
+def get_user_index( context, user_uri = None ):
+    """
+    Reads the users from the service and indexes them by user name
 
-    return False
+    Args:
+        context: The Redfish client object with an open session
+        user_uri: The URI of a single account to read instead of reading all users
+
+    Returns:
+        A dictionary of the users keyed by user name
+    """
+    if user_uri is not None:
+        try:
+            account = context.get( user_uri )
+            redfish_utilities.verify_response( account )
+            account_dict = account.dict
+            if "UserName" in account_dict:
+                return { account_dict["UserName"]: account_dict }
+        except Exception:
+            pass
+        # Unable to read the account directly; fall back to reading all users
+
+    return { user["UserName"]: user for user in redfish_utilities.get_users( context ) }
 
 if __name__ == "__main__":
 
@@ -70,17 +102,16 @@ if __name__ == "__main__":
         base_url = "http://" + args.rhost
     with redfish.redfish_client( base_url = base_url, username = args.user, password = args.password ) as redfish_obj:
         # Create the results object
-        service_root = redfish_obj.get( "/redfish/v1/" )
-        results = Results( "Account Management", service_root.dict )
+        service_root = redfish_obj.get( "/redfish/v1/" ).dict
+        results = Results( "Account Management", service_root )
         if args.directory is not None:
             results.set_output_dir( args.directory )
 
         # Get the list of current users
         try:
-            usernames = []
+            usernames = set()
             user_list = redfish_utilities.get_users( redfish_obj )
-            for user in user_list:
-                usernames.append( user["UserName"] )
+            usernames.update( user["UserName"] for user in user_list )
             user_count = len( user_list )
             if user_count == 0:
                 results.update_test_results( "User Count", 1, "No users were found." )
@@ -98,13 +129,21 @@ if __name__ == "__main__":
         # Create a new user
         user_added = False
         last_error = ""
-        test_passwords = [ "hUPgd9Z4", "7jIl3dn!kd0Fql", "m5Ljed3!n0olvdS*m0kmWER15!" ]
+        # Try the passwords that fit within the length limits advertised by the service first
+        min_length = 0
+        max_length = None
+        if "AccountService" in service_root:
+            account_service = redfish_obj.get( service_root["AccountService"]["@odata.id"] )
+            if account_service.status == 200:
+                min_length = account_service.dict.get( "MinPasswordLength" ) or 0
+                max_length = account_service.dict.get( "MaxPasswordLength" )
+        test_passwords = sorted( TEST_PASSWORDS, key = lambda password: len( password ) < min_length or ( max_length is not None and len( password ) > max_length ) )
+
         print( "Creating new user '{}'".format( test_username ) )
-        for x in range( 3 ):
+        for test_password in test_passwords:
             # Try different passwords in case there are password requirements that we cannot detect
             try:
-                test_password = test_passwords[x]
-                redfish_utilities.add_user( redfish_obj, test_username, test_password, "Administrator" )
+                add_response = redfish_utilities.add_user( redfish_obj, test_username, test_password, "Administrator" )
                 user_added = True
                 break
             except Exception as err:
@@ -117,16 +156,25 @@ if __name__ == "__main__":
         # Only run the remaining tests if the user was added successfully
         if user_added:
             # Get the list of current users to verify the new user was added
-            if verify_user( redfish_obj, test_username, role = "Administrator" ):
+            # The same list is used to check if the user needs to be enabled since nothing has changed in between
+            users = get_user_index( redfish_obj )
+            if verify_user( redfish_obj, test_username, role = "Administrator", users = users ):
                 results.update_test_results( "Add User", 0, None )
             else:
                 results.update_test_results( "Add User", 1, "Failed to find user '{}' with the role 'Administrator'.".format( test_username ) )
 
+            # Later checks only read the account of the test user rather than reading all users
+            # The URI of the new account comes from the Location header; if it's not provided, all users are read instead
+            test_user_uri = None
+            location = add_response.getheader( "Location" )
+            if location is not None:
+                test_user_uri = urllib.parse.urlparse( location ).path
+
             # Check if the user needs to be enabled
             try:
-                if verify_user( redfish_obj, test_username, enabled = False ):
+                if verify_user( redfish_obj, test_username, enabled = False, users = users ):
                     redfish_utilities.modify_user( redfish_obj, test_username, new_enabled = True )
-                    if verify_user( redfish_obj, test_username, enabled = True ):
+                    if verify_user( redfish_obj, test_username, enabled = True, users = get_user_index( redfish_obj, test_user_uri ) ):
                         results.update_test_results( "Enable User", 0, None )
                     else:
                         results.update_test_results( "Enable User", 1, "User '{}' not enabled after successful PATCH.".format( test_username ) )
@@ -136,11 +184,13 @@ if __name__ == "__main__":
                 results.update_test_results( "Enable User", 1, "Failed to enable user '{}' ({}).".format( test_username, err ) )
 
             # Log in with the new user
+            # Reading the account service is enough to show the session is usable; no need to walk the entire user list
+            account_service_uri = service_root["AccountService"]["@odata.id"]
             print( "Logging in as '{}'".format( test_username ) )
             test_obj = redfish.redfish_client( base_url = base_url, username = test_username, password = test_password )
             try:
                 test_obj.login( auth = "session" )
-                test_list = redfish_utilities.get_users( test_obj )
+                redfish_utilities.verify_response( test_obj.get( account_service_uri ) )
                 results.update_test_results( "Credential Check", 0, None )
             except:
                 results.update_test_results( "Credential Check", 1, "Failed to login with user '{}'.".format( test_username ) )
@@ -152,7 +202,7 @@ if __name__ == "__main__":
             test_obj = redfish.redfish_client( base_url = base_url, username = test_username, password = test_password + "ExtraStuff" )
             try:
                 test_obj.login( auth = "session" )
-                test_list = redfish_utilities.get_users( test_obj )
+                redfish_utilities.verify_response( test_obj.get( account_service_uri ) )
                 results.update_test_results( "Credential Check", 1, "Login with user '{}' when using invalid credentials.".format( test_username ) )
             except:
                 results.update_test_results( "Credential Check", 0, None )
@@ -166,7 +216,7 @@ if __name__ == "__main__":
                     print( "Setting user '{}' to role '{}'".format( test_username, role ) )
                     redfish_utilities.modify_user( redfish_obj, test_username, new_role = role )
                     results.update_test_results( "Change Role", 0, None )
-                    if verify_user( redfish_obj, test_username, role = role ):
+                    if verify_user( redfish_obj, test_username, role = role, users = get_user_index( redfish_obj, test_user_uri ) ):
                         results.update_test_results( "Change Role", 0, None )
                     else:
                         results.update_test_results( "Change Role", 1, "Failed to find user '{}' with the role '{}'.".format( test_username, role ) )
@@ -184,6 +234,9 @@ if __name__ == "__main__":
                     results.update_test_results( "Delete User", 0, None )
             except Exception as err:
                 results.update_test_results( "Delete User", 1, "Failed to delete user '{}' ({}).".format( test_username, err ) )
+        else:
+            for test_name in USER_TESTS:
+                results.update_test_results( test_name, 0, "Failure of the 'Add User' test prevents performing this test.", skipped = True )
 
     # Save the results
     results.write_results()
@@ -24,6 +24,30 @@ import redfish_utilities
 import toolspath
 from usecase.results import Results
 
+# VLAN properties to check in each Ethernet interface
+VLAN_PROPERTIES = ( "VLANEnable", "VLANId", "VLANPriority", "Tagged" )
+
+# VLAN properties that are expected to be present
+REQUIRED_VLAN_PROPERTIES = frozenset( [ "VLANEnable", "VLANId" ] )
+
+# Address properties to check in each Ethernet interface
+ADDRESS_PROPERTIES = ( "NameServers", "StaticNameServers", "IPv4Addresses", "IPv4StaticAddresses", "IPv6Addresses", "IPv6StaticAddresses", "IPv6DefaultGateway", "IPv6StaticDefaultGateways" )
+
+# Address properties that show the current status; the array grows and shrinks based on what's active, so null is not allowed
+STATUS_ADDRESS_PROPERTIES = frozenset( [ "NameServers", "IPv4Addresses", "IPv6Addresses" ] )
+
+# Properties expected in each entry of the IP address arrays
+IP_ADDRESS_PROPERTIES = {
+    "IPv4Addresses": ( "Gateway", "Address", "SubnetMask", "AddressOrigin" ),
+    "IPv4StaticAddresses": ( "Gateway", "Address", "SubnetMask" ),
+    "IPv6Addresses": ( "Address", "PrefixLength", "AddressOrigin", "AddressState" ),
+    "IPv6StaticAddresses": ( "Address", "PrefixLength" ),
+    "IPv6StaticDefaultGateways": ( "Address", "PrefixLength" )
+}
+
+# Placeholder values that should be null instead
+DUMMY_ADDRESSES = frozenset( [ "", "0.0.0.0", "::" ] )
+
 def dummy_address_check( address ):
     """
     Determines if values contain dummy addresses
@@ -35,24 +59,42 @@ def dummy_address_check( address ):
         True if any of the data contains a dummy address; False otherwise
     """
 
-    dummy_addresses = [ "", "0.0.0.0", "::" ]
-
-    if isinstance( address, dict ):
-        # Go through each property and check the value
-        for property in address:
-            if dummy_address_check( address[property] ):
+    # Walk the data with a stack rather than recursing into each nested object and array
+    values = [ address ]
+    while len( values ) > 0:
+        value = values.pop()
+        if isinstance( value, dict ):
+            values.extend( value.values() )
+        elif isinstance( value, list ):
+            values.extend( value )
+        elif isinstance( value, str ):
+            if value in DUMMY_ADDRESSES:
                 return True
-    elif isinstance( address, list ):
-        # Go through each index and check the value
-        for value in address:
-            if dummy_address_check( value ):
-                return True
-    elif isinstance( address, str ):
-        if address in dummy_addresses:
-            return True
 
     return False
 
+def get_collection_members( context, collection_uri ):
+    """
+    Reads the members of a collection, following any additional pages
+
+    Args:
+        context: The Redfish client object with an open session
+        collection_uri: The URI of the collection
+
+    Returns:
+        A list of the URIs of the members in the collection
+    """
+
+    members = []
+    page_uri = collection_uri
+    while page_uri is not None:
+        page = context.get( page_uri )
+        redfish_utilities.verify_response( page )
+        page_dict = page.dict
+        members.extend( [ member["@odata.id"] for member in page_dict.get( "Members", [] ) ] )
+        page_uri = page_dict.get( "Members@odata.nextLink" )
+    return members
+
 if __name__ == '__main__':
 
     # Get the input arguments
@@ -83,7 +125,13 @@ if __name__ == '__main__':
             results.set_output_dir( args.directory )
 
         # Get the available managers
-        test_managers = redfish_utilities.get_manager_ids( redfish_obj )
+        # The collections are walked directly so each manager and Ethernet interface is only read once; the utility lookups re-read the manager and its collections for every interface
+        test_managers = []
+        if "Managers" in service_root.dict:
+            for manager_uri in get_collection_members( redfish_obj, service_root.dict["Managers"]["@odata.id"] ):
+                manager_resp = redfish_obj.get( manager_uri )
+                redfish_utilities.verify_response( manager_resp )
+                test_managers.append( manager_resp.dict )
         manager_count = len( test_managers )
         print( "Found {} manager instances".format( manager_count ) )
         if manager_count == 0:
@@ -92,9 +140,15 @@ if __name__ == '__main__':
             results.update_test_results( "Manager Count", 0, None )
 
         # Go through each manager and test each of its Ethernet interfaces
-        for manager in test_managers:
+        # Some services list the same Ethernet interface under more than one manager, so the interfaces already read are kept by URI
+        interface_cache = {}
+        for manager_dict in test_managers:
+            manager = manager_dict["Id"]
+
             # Get the available Ethernet interfaces
-            test_interfaces = redfish_utilities.get_manager_ethernet_interface_ids( redfish_obj, manager )
+            test_interfaces = []
+            if "EthernetInterfaces" in manager_dict:
+                test_interfaces = get_collection_members( redfish_obj, manager_dict["EthernetInterfaces"]["@odata.id"] )
             interface_count = len( test_interfaces )
             print( "Found {} Ethernet interface instances in manager '{}'".format( interface_count, manager ) )
             if interface_count == 0:
@@ -103,77 +157,75 @@ if __name__ == '__main__':
                 results.update_test_results( "Ethernet Interface Count", 0, None )
 
             # Go through each Ethernet interface and test the response payloads
-            for interface in test_interfaces:
+            for interface_uri in test_interfaces:
+                # The payload is decoded once and kept since the response decodes the body again each time it's accessed
+                interface_dict = interface_cache.get( interface_uri )
+                if interface_dict is None:
+                    interface_resp = redfish_obj.get( interface_uri )
+                    redfish_utilities.verify_response( interface_resp )
+                    interface_dict = interface_resp.dict
+                    interface_cache[interface_uri] = interface_dict
+                interface = interface_dict["Id"]
                 print( "Testing interface '{}'".format( interface ) )
-                interface_resp = redfish_utilities.get_manager_ethernet_interface( redfish_obj, manager, interface )
+                # Every failure message ends with the location of the interface, so it's only built once per interface
+                location = "in manager '{}' interface '{}'".format( manager, interface )
 
                 # Check VLAN properties
-                if "VLAN" in interface_resp.dict:
-                    property_check_list = [ "VLANEnable", "VLANId", "VLANPriority", "Tagged" ]
-                    req_property_check_list = [ "VLANEnable", "VLANId" ]
-                    for property in property_check_list:
+                if "VLAN" in interface_dict:
+                    vlan = interface_dict["VLAN"]
+                    for property in VLAN_PROPERTIES:
                         # Check if the property is null
-                        if property in interface_resp.dict["VLAN"]:
-                            if interface_resp.dict["VLAN"][property] is None:
-                                results.update_test_results( "Null Usage", 1, "'{}' contains null values in manager '{}' interface '{}'".format( property, manager, interface ) )
+                        if property in vlan:
+                            if vlan[property] is None:
+                                results.update_test_results( "Null Usage", 1, "'{}' contains null values {}".format( property, location ) )
                             else:
                                 results.update_test_results( "Null Usage", 0, None )
 
                         # Check if the property is expected
-                        if property in req_property_check_list:
-                            if property in interface_resp.dict["VLAN"]:
+                        if property in REQUIRED_VLAN_PROPERTIES:
+                            if property in vlan:
                                 results.update_test_results( "Expected Properties", 0, None )
                             else:
-                                results.update_test_results( "Expected Properties", 1, None, "VLAN does not contain {} in manager '{}' interface '{}'".format( property, manager, interface ) )
+                                results.update_test_results( "Expected Properties", 1, None, "VLAN does not contain {} {}".format( property, location ) )
 
                 # Check usage of name servers
-                property_check_list = [ "NameServers", "StaticNameServers", "IPv4Addresses", "IPv4StaticAddresses", "IPv6Addresses", "IPv6StaticAddresses", "IPv6DefaultGateway", "IPv6StaticDefaultGateways" ]
-                property_status_list = [ "NameServers", "IPv4Addresses", "IPv6Addresses" ]
-                property_ip_list = [ "IPv4Addresses", "IPv4StaticAddresses", "IPv6Addresses", "IPv6StaticAddresses", "IPv6StaticDefaultGateways" ]
-                for property in property_check_list:
-                    if property in interface_resp.dict:
-                        # Status properties have an additional check to ensure null is not used; the array grows and shrinks based on what's active
-                        if property in property_status_list:
-                            if None in interface_resp.dict[property]:
-                                results.update_test_results( "Null Usage", 1, "'{}' contains null values in manager '{}' interface '{}'".format( property, manager, interface ) )
+                for property in ADDRESS_PROPERTIES:
+                    if property in interface_dict:
+                        # Status properties have an additional check to ensure null is not used
+                        if property in STATUS_ADDRESS_PROPERTIES:
+                            if None in interface_dict[property]:
+                                results.update_test_results( "Null Usage", 1, "'{}' contains null values {}".format( property, location ) )
                             else:
                                 results.update_test_results( "Null Usage", 0, None )
 
                         # Check that dummy addresses are not used
-                        if dummy_address_check( interface_resp.dict[property] ):
-                            results.update_test_results( "Dummy Value Usage", 1, "'{}' contains an empty string, 0.0.0.0, or :: rather than null in manager '{}' interface '{}'".format( property, manager, interface ) )
+                        if dummy_address_check( interface_dict[property] ):
+                            results.update_test_results( "Dummy Value Usage", 1, "'{}' contains an empty string, 0.0.0.0, or :: rather than null {}".format( property, location ) )
                         else:
                             results.update_test_results( "Dummy Value Usage", 0, None )
 
-                        # Check for expected IPv4 properties
-                        if property in property_ip_list:
-                            for i, address in enumerate( interface_resp.dict[property] ):
+                        # Check for expected IP address properties
+                        ip_properties = IP_ADDRESS_PROPERTIES.get( property )
+                        if ip_properties is not None:
+                            ipv4_property = "IPv4" in property
+                            for i, address in enumerate( interface_dict[property] ):
                                 # Skip null entries
                                 if address is None:
                                     continue
 
                                 # Check that there is only a Gateway for index 0
-                                if "IPv4" in property:
+                                if ipv4_property:
                                     if "Gateway" in address and i != 0:
-                                        results.update_test_results( "IPv4 Gateway", 1, "IPv4 gateway property found at non-first array index in manager '{}' interface '{}'".format( manager, interface ) )
+                                        results.update_test_results( "IPv4 Gateway", 1, "IPv4 gateway property found at non-first array index {}".format( location ) )
                                     else:
                                         results.update_test_results( "IPv4 Gateway", 0, None )
 
                                 # Check for presence of properties
-                                if "IPv4" in property:
-                                    ip_properties = [ "Gateway", "Address", "SubnetMask" ]
-                                    if "Static" not in property:
-                                        ip_properties.append( "AddressOrigin" )
-                                else:
-                                    ip_properties = [ "Address", "PrefixLength" ]
-                                    if "Static" not in property:
-                                        ip_properties.append( "AddressOrigin" )
-                                        ip_properties.append( "AddressState" )
                                 for ip_property in ip_properties:
                                     if ip_property == "Gateway" and i == 0:
                                         continue
                                     if ip_property not in address:
-                                        results.update_test_results( "Expected Properties", 1, None, "{} index {} does not contain {} in manager '{}' interface '{}'".format( property, i, ip_property, manager, interface ) )
+                                        results.update_test_results( "Expected Properties", 1, None, "{} index {} does not contain {} {}".format( property, i, ip_property, location ) )
                                     else:
                                         results.update_test_results( "Expected Properties", 0, None )
 
@@ -24,6 +24,9 @@ import redfish_utilities
 import toolspath
 from usecase.results import Results
 
+# Boot override targets to test, in order of preference
+BOOT_TEST_TARGETS = ( "Pxe", "Usb" )
+
 if __name__ == '__main__':
 
     # Get the input arguments
@@ -54,11 +57,14 @@ if __name__ == '__main__':
             results.set_output_dir( args.directory )
 
         # Get the available systems
+        # The boot object of each system is kept so it does not need to be read again before testing
         test_systems = []
+        system_boot_objs = {}
         system_col = redfish_obj.get( service_root.dict["Systems"]["@odata.id"] )
         for member in system_col.dict["Members"]:
-            system = redfish_obj.get( member["@odata.id"] )
-            test_systems.append( system.dict["Id"] )
+            system = redfish_obj.get( member["@odata.id"] ).dict
+            test_systems.append( system["Id"] )
+            system_boot_objs[system["Id"]] = system.get( "Boot" )
 
         # Check that the system list is not empty
         system_count = len( test_systems )
@@ -69,25 +75,30 @@ if __name__ == '__main__':
             results.update_test_results( "System Count", 0, None )
 
         # Perform a test on each system found
+        tested_systems = []
+        reset_systems = {}
         for system in test_systems:
             # See if PXE or USB are allowable
             test_path = None
-            boot_obj = redfish_utilities.get_system_boot( redfish_obj, system )
-            if "BootSourceOverrideTarget@Redfish.AllowableValues" in boot_obj:
-                if "Pxe" in boot_obj["BootSourceOverrideTarget@Redfish.AllowableValues"]:
-                    test_path = "Pxe"
-                elif "Usb" in boot_obj["BootSourceOverrideTarget@Redfish.AllowableValues"]:
-                    test_path = "Usb"
+            boot_obj = system_boot_objs[system]
+            if boot_obj is None:
+                boot_obj = redfish_utilities.get_system_boot( redfish_obj, system )
+            allowable_targets = boot_obj.get( "BootSourceOverrideTarget@Redfish.AllowableValues" )
+            if allowable_targets is not None:
+                for target in BOOT_TEST_TARGETS:
+                    if target in allowable_targets:
+                        test_path = target
+                        break
             else:
                 test_path = "Pxe"
             if test_path is None:
                 print( "{} does not support PXE or USB boot override".format( system ) )
-                results.update_test_results( "Boot Check", 0, "{} does not allow for PXE or USB boot override.".format( system ), skipped = True )
-                results.update_test_results( "Continuous Boot Set", 0, "{} does not allow for PXE or USB boot override.".format( system ), skipped = True )
-                results.update_test_results( "Boot Set", 0, "{} does not allow for PXE or USB boot override.".format( system ), skipped = True )
-                results.update_test_results( "Boot Verify", 0, "{} does not allow for PXE or USB boot override.".format( system ), skipped = True )
+                skip_msg = "{} does not allow for PXE or USB boot override.".format( system )
+                for test_name in [ "Boot Check", "Continuous Boot Set", "Boot Set", "Boot Verify" ]:
+                    results.update_test_results( test_name, 0, skip_msg, skipped = True )
                 continue
             results.update_test_results( "Boot Check", 0, None )
+            tested_systems.append( system )
 
             # Check that Continuous is allowed to be applied to the boot override settings
             print( "Setting {} to boot continuously from {}".format( system, test_path ) )
@@ -117,26 +128,37 @@ if __name__ == '__main__':
                         response = redfish_utilities.system_reset( redfish_obj, system )
                         response = redfish_utilities.poll_task_monitor( redfish_obj, response )
                         redfish_utilities.verify_response( response )
-
-                        # Monitor the system to go back to None
-                        print( "Monitoring boot progress for {}...".format( system ) )
-                        for i in range( 0, 300 ):
-                            time.sleep( 1 )
-                            boot_obj = redfish_utilities.get_system_boot( redfish_obj, system )
-                            if boot_obj["BootSourceOverrideEnabled"] == "Disabled":
-                                break
-                        if boot_obj["BootSourceOverrideEnabled"] == "Disabled":
-                            print( "{} booted from {}!".format( system, test_path ) )
-                            results.update_test_results( "Boot Verify", 0, None )
-                        else:
-                            raise ValueError( "{} did not reset back to 'Disabled'".format( system ) )
+                        reset_systems[system] = test_path
                     except Exception as err:
                         results.update_test_results( "Boot Verify", 1, "{} failed to boot from {}.".format( system, test_path ) )
             except Exception as err:
                 results.update_test_results( "Boot Set", 1, "Failed to set {} to boot from {} ({}).".format( system, test_path, err ) )
                 results.update_test_results( "Boot Verify", 0, "Boot setting not applied.", skipped = True )
 
-            # Cleanup (should be clean already if everything passed)
+        # Monitor the systems that were reset to go back to None
+        # All of the systems are monitored together so their boots can progress in parallel
+        if len( reset_systems ) > 0:
+            print( "Monitoring boot progress for {}...".format( ", ".join( reset_systems ) ) )
+        for i in range( 0, 300 ):
+            if len( reset_systems ) == 0:
+                break
+            time.sleep( 1 )
+            for system, test_path in list( reset_systems.items() ):
+                try:
+                    boot_obj = redfish_utilities.get_system_boot( redfish_obj, system )
+                    if boot_obj["BootSourceOverrideEnabled"] != "Disabled":
+                        continue
+                    print( "{} booted from {}!".format( system, test_path ) )
+                    results.update_test_results( "Boot Verify", 0, None )
+                except Exception as err:
+                    results.update_test_results( "Boot Verify", 1, "{} failed to boot from {} ({}).".format( system, test_path, err ) )
+                del reset_systems[system]
+        for system, test_path in reset_systems.items():
+            # Did not reset back to 'Disabled'
+            results.update_test_results( "Boot Verify", 1, "{} failed to boot from {}.".format( system, test_path ) )
+
+        # Cleanup (should be clean already if everything passed)
+        for system in tested_systems:
             try:
                 redfish_utilities.set_system_boot( redfish_obj, system_id = system, ov_target = "None", ov_enabled = "Disabled" )
             except:
@@ -23,6 +23,51 @@ import redfish_utilities
 import toolspath
 from usecase.results import Results
 
+# Reset types that leave the system powered off
+OFF_RESET_TYPES = frozenset( [ "ForceOff", "GracefulShutdown" ] )
+
+# Reset types that can only be applied while the system is powered on
+ON_REQUIRED_RESET_TYPES = frozenset( [ "GracefulShutdown", "GracefulRestart", "ForceRestart" ] )
+
+# Reset types that power on the system
+POWER_ON_RESET_TYPES = frozenset( [ "On", "ForceOn" ] )
+
+def get_reset_order( reset_types, power_state ):
+    """
+    Orders the reset types so each one is issued from a power state where it can be applied
+
+    Args:
+        reset_types: The allowable reset types for the system
+        power_state: The current power state of the system
+
+    Returns:
+        The list of reset types in the order they should be tested
+    """
+
+    # Pushing the power button can leave the system on or off depending on the system design, so it's always tested last
+    pending = [ reset_type for reset_type in reset_types if reset_type != "PushPowerButton" ]
+
+    # Resets that power off the system are tested last; the ones that need the system powered on go first
+    off_resets = sorted( [ reset_type for reset_type in pending if reset_type in OFF_RESET_TYPES ], key = lambda reset_type: reset_type not in ON_REQUIRED_RESET_TYPES )
+
+    # Keep power-on resets back to turn the system on again between the resets that power it off
+    # If the system starts powered off, one power-on reset is needed up front
+    power_on_resets = [ reset_type for reset_type in pending if reset_type in POWER_ON_RESET_TYPES ]
+    reserve_count = min( len( off_resets ) - 1, len( power_on_resets ) - ( 1 if power_state == "Off" else 0 ) )
+    reserved = power_on_resets[len( power_on_resets ) - reserve_count:] if reserve_count > 0 else []
+
+    # Test the remaining resets first; if the system is powered off, start with the ones that power it on
+    order = [ reset_type for reset_type in pending if reset_type not in OFF_RESET_TYPES and reset_type not in reserved ]
+    if power_state == "Off":
+        order.sort( key = lambda reset_type: 0 if reset_type in POWER_ON_RESET_TYPES else ( 2 if reset_type in ON_REQUIRED_RESET_TYPES else 1 ) )
+    for i, reset_type in enumerate( off_resets ):
+        if i > 0 and len( reserved ) > 0:
+            order.append( reserved.pop( 0 ) )
+        order.append( reset_type )
+    if "PushPowerButton" in reset_types:
+        order.append( "PushPowerButton" )
+    return order
+
 if __name__ == '__main__':
 
     # Get the input arguments
@@ -53,12 +98,30 @@ if __name__ == '__main__':
         if args.directory is not None:
             results.set_output_dir( args.directory )
 
+        # Only request the PowerState property when monitoring systems if the service supports $select
+        protocol_features = service_root.dict.get( "ProtocolFeaturesSupported", {} )
+        select_power_state = protocol_features.get( "SelectQuery", False )
+
         # Get the available systems
+        # If the service supports $expand, read the systems along with the collection rather than one at a time
+        # The reset action of each system is kept so the allowable reset types do not need to be read again
         test_systems = []
-        system_col = redfish_obj.get( service_root.dict["Systems"]["@odata.id"] )
+        system_col_uri = service_root.dict["Systems"]["@odata.id"]
+        system_col = None
+        if protocol_features.get( "ExpandQuery", {} ).get( "NoLinks", False ):
+            system_col = redfish_obj.get( system_col_uri, args = { "$expand": "." } )
+            if system_col.status != 200:
+                system_col = None
+        if system_col is None:
+            system_col = redfish_obj.get( system_col_uri )
         for member in system_col.dict["Members"]:
-            system = redfish_obj.get( member["@odata.id"] )
-            test_systems.append( { "Id": system.dict["Id"], "URI": member["@odata.id"] } )
+            if "Id" in member:
+                # Already expanded
+                system = member
+            else:
+                system = redfish_obj.get( member["@odata.id"] ).dict
+            test_systems.append( { "Id": system["Id"], "URI": member["@odata.id"], "PowerState": system.get( "PowerState" ),
+                "ResetAction": system.get( "Actions", {} ).get( "#ComputerSystem.Reset" ) } )
 
         # Check that the system list is not empty
         system_count = len( test_systems )
@@ -71,26 +134,36 @@ if __name__ == '__main__':
         # Perform a test on each system found
         for system in test_systems:
             # Check what types of resets are supported
-            try:
-                reset_types = None
-                reset_uri, reset_params = redfish_utilities.get_system_reset_info( redfish_obj, system["Id"] )
-            except Exception as err:
-                results.update_test_results( "Reset Type Check", 1, "Could not get reset info for {} ({}).".format( system["Id"], err ) )
-                continue
+            # The allowable values are usually in the reset action itself; only look up the reset info when they're not (such as when action info is used)
+            reset_types = None
+            if system["ResetAction"] is not None:
+                reset_types = system["ResetAction"].get( "ResetType@Redfish.AllowableValues" )
+            if reset_types is None:
+                try:
+                    reset_uri, reset_params = redfish_utilities.get_system_reset_info( redfish_obj, system["Id"] )
+                except Exception as err:
+                    results.update_test_results( "Reset Type Check", 1, "Could not get reset info for {} ({}).".format( system["Id"], err ) )
+                    continue
 
-            for param in reset_params:
-                if param["Name"] == "ResetType":
-                    reset_types = param["AllowableValues"]
+                for param in reset_params:
+                    if param["Name"] == "ResetType":
+                        reset_types = param["AllowableValues"]
             if reset_types is None:
                 results.update_test_results( "Reset Type Check", 1, "{} is not advertising any allowable resets.".format( system["Id"] ) )
                 continue
             results.update_test_results( "Reset Type Check", 0, None )
 
             # Reset the system
-            for reset_type in reset_types:
+            # Track the power state locally so resets that cannot be applied from the current state are not attempted
+            current_power_state = system["PowerState"]
+            for reset_type in get_reset_order( reset_types, current_power_state ):
                 if reset_type == "Nmi":
                     # NMI could fail depending on the state of the system; no real reason to test this at this time
                     continue
+                if current_power_state == "Off" and ( reset_type in ON_REQUIRED_RESET_TYPES or reset_type in OFF_RESET_TYPES ):
+                    # Powering off a system that is already off does not test anything
+                    results.update_test_results( "Reset Performed", 0, "{} is powered off; skipping {}.".format( system["Id"], reset_type ), skipped = True )
+                    continue
                 print( "Resetting {} using {}".format( system["Id"], reset_type ) )
                 try:
                     response = redfish_utilities.system_reset( redfish_obj, system["Id"], reset_type )
@@ -99,6 +172,7 @@ if __name__ == '__main__':
                     results.update_test_results( "Reset Performed", 0, None )
                 except Exception as err:
                     results.update_test_results( "Reset Performed", 1, "Failed to reset {} using {} ({})".format( system["Id"], reset_type, err ) )
+                    current_power_state = None
                     continue
 
                 # Allow some time before checking the power state
@@ -106,20 +180,31 @@ if __name__ == '__main__':
                 time.sleep( args.timeout )
 
                 # Check the power state to ensure it's in the proper state
-                exp_power_state = "On"
-                if reset_type == "ForceOff" or reset_type == "GracefulShutdown":
-                    exp_power_state = "Off"
+                exp_power_state = "Off" if reset_type in OFF_RESET_TYPES else "On"
                 if reset_type == "PushPowerButton":
                     # Depending on the system design, pushing the button can have different outcomes with regards to the power state
+                    current_power_state = None
                     continue
                 print( "Monitoring power state for {}...".format( system["Id"] ) )
+                # The polling interval starts short and backs off so fast transitions are seen quickly without flooding slow services
                 power_state = None
-                for i in range( 0, 10 ):
-                    system_info = redfish_obj.get( system["URI"] )
+                poll_delay = 1
+                poll_deadline = time.monotonic() + 50
+                while True:
+                    if select_power_state:
+                        system_info = redfish_obj.get( system["URI"], args = { "$select": "PowerState" } )
+                        if system_info.status >= 400:
+                            # Service rejected the query; fall back to reading the full system resource
+                            select_power_state = False
+                            system_info = redfish_obj.get( system["URI"] )
+                    else:
+                        system_info = redfish_obj.get( system["URI"] )
                     power_state = system_info.dict.get( "PowerState" )
-                    if power_state is None or power_state == exp_power_state:
+                    if power_state is None or power_state == exp_power_state or time.monotonic() >= poll_deadline:
                         break
-                    time.sleep( 5 )
+                    time.sleep( poll_delay )
+                    poll_delay = min( poll_delay * 2, 8 )
+                current_power_state = power_state
                 if power_state is not None:
                     if power_state != exp_power_state:
                         results.update_test_results( "Power State Check", 1, "{} was not in the {} state after using {} as the reset type.".format( system["Id"], exp_power_state, reset_type ) )
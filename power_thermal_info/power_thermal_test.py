@@ -76,25 +76,28 @@ if __name__ == '__main__':
         results.update_test_results( "Chassis Count", 0, None )
 
     # Test 2: Check that each chassis has at least one sensor
+    # Test 3: Check that all sensors not "Enabled" don't have a bogus reading
+    # Both tests are performed in a single pass over each chassis
+    print( "Testing sensor counts and readings..." )
     for chassis in sensors:
-        sensor_count = len( chassis["Readings"] )
+        readings = chassis["Readings"]
+        sensor_count = len( readings )
         print( "Found {} sensors in Chassis '{}'".format( sensor_count, chassis["ChassisName"] ) )
         if sensor_count == 0:
             results.update_test_results( "Sensor Count", 1, "No sensors were found in Chassis '{}'.".format( chassis["ChassisName"] ) )
-        else:
-            results.update_test_results( "Sensor Count", 0, None )
+            continue
+        results.update_test_results( "Sensor Count", 0, None )
 
-    # Test 3: Check that all sensors not "Enabled" don't have a bogus reading
-    print( "Testing sensor readings..." )
-    for chassis in sensors:
-        for reading in chassis["Readings"]:
-            if reading["State"] is not None and reading["Reading"] is not None:
+        for reading in readings:
+            state = reading["State"]
+            value = reading["Reading"]
+            if state is not None and value is not None:
                 # Both State and Reading are populated; perform the test
-                if reading["State"] != "Enabled" and reading["Reading"] != reading["State"]:
+                if state != "Enabled" and value != state:
                     # When State is not Enabled, Reading is supposed to be a copy of State
                     # The only time this is not true is if there is a bogus reading, such as reporting "0V" when a device is absent
                     results.update_test_results( "Sensor State", 1, "Sensor '{}' in chassis '{}' contains reading '{}', but is in state '{}'.".format(
-                        reading["Name"], chassis["ChassisName"], reading["Reading"], reading["State"] ) )
+                        reading["Name"], chassis["ChassisName"], value, state ) )
                 else:
                     results.update_test_results( "Sensor State", 0, None )
 
@@ -24,6 +24,29 @@ import redfish_utilities
 import toolspath
 from usecase.results import Results
 
+# Properties expected in the $select response; optional properties are expected only if they are present in the full resource
+SELECT_REQUIRED_PROPERTIES = ( "@odata.id", "@odata.type", "Name", "AssignedPrivileges" )
+SELECT_OPTIONAL_PROPERTIES = ( "@odata.context", "@odata.etag" )
+
+# Responses for resources read without query parameters; none of the tests modify resources, so responses are shared between tests
+resource_cache = {}
+
+def get_resource( redfish_obj, uri ):
+    """
+    Gets a resource without query parameters, reusing the response if the resource was already read
+
+    Args:
+        redfish_obj: The Redfish client object with an open session
+        uri: The URI of the resource
+
+    Returns:
+        The response of the resource
+    """
+
+    if uri not in resource_cache:
+        resource_cache[uri] = redfish_obj.get( uri )
+    return resource_cache[uri]
+
 def filter_test( redfish_obj, service_root, results ):
     """
     Tests the $filter query parameter
@@ -38,46 +61,58 @@ def filter_test( redfish_obj, service_root, results ):
     if "AccountService" not in service_root.dict:
         results.update_test_results( "Filter Check", 0, "Account service not found for testing.", skipped = True )
         return
-    account_service = redfish_obj.get( service_root.dict["AccountService"]["@odata.id"] )
+    account_service = get_resource( redfish_obj, service_root.dict["AccountService"]["@odata.id"] )
     if "Roles" not in account_service.dict:
         results.update_test_results( "Filter Check", 0, "Role collection not found for testing.", skipped = True )
         return
     role_collection_uri = account_service.dict["Roles"]["@odata.id"]
-    role_collection = redfish_obj.get( role_collection_uri )
+    role_collection = get_resource( redfish_obj, role_collection_uri )
     role_count = len( role_collection.dict["Members"] )
     if role_count == 0:
         results.update_test_results( "Filter Check", 0, "Role collection is empty.", skipped = True )
         return
 
     # Get the first and last roles to be used for building $filter parameters
-    role_first = redfish_obj.get( role_collection.dict["Members"][0]["@odata.id"] )
-    role_first_uri = role_first.dict["@odata.id"]
-    role_last = redfish_obj.get( role_collection.dict["Members"][-1]["@odata.id"] )
+    # If the service supports $expand, read the roles along with the collection rather than one at a time
+    role_first = role_last = None
+    if service_root.dict["ProtocolFeaturesSupported"].get( "ExpandQuery", {} ).get( "NoLinks", False ):
+        expand_response = redfish_obj.get( role_collection_uri, args = { "$expand": "." } )
+        if expand_response.status == 200:
+            expand_members = expand_response.dict.get( "Members", [] )
+            if len( expand_members ) == role_count and "Id" in expand_members[0] and "Id" in expand_members[-1]:
+                role_first = expand_members[0]
+                role_last = expand_members[-1]
+    if role_first is None:
+        role_first = get_resource( redfish_obj, role_collection.dict["Members"][0]["@odata.id"] ).dict
+        role_last = get_resource( redfish_obj, role_collection.dict["Members"][-1]["@odata.id"] ).dict
+    role_first_uri = role_first["@odata.id"]
     first_and_last = 2
-    if role_first == role_last:
+    if role_first["@odata.id"] == role_last["@odata.id"]:
         first_and_last = 1
 
     # Perform various $filter requests on the collection and check the members returned
+    match_first = "Id eq '{}'".format( role_first["Id"] )
+    match_last = "Id eq '{}'".format( role_last["Id"] )
     filter_checks = [
         {
             "Description": "Match exactly one",
-            "Query": { "$filter": "Id eq '" + role_first.dict["Id"] + "'" },
+            "Query": { "$filter": match_first },
             "ExpectedLength": 1
         },
         {
             "Description": "Match exactly everything except one",
-            "Query": { "$filter": "not (Id eq '" + role_first.dict["Id"] + "')" },
+            "Query": { "$filter": "not ({})".format( match_first ) },
             "ExpectedLength": role_count - 1
         },
         {
             "Description": "Match first or last",
-            "Query": { "$filter": "Id eq '" + role_first.dict["Id"] + "'" + " or Id eq '" + role_last.dict["Id"] + "'" },
+            "Query": { "$filter": "{} or {}".format( match_first, match_last ) },
             "ExpectedLength": first_and_last
         }
     ]
     for check in filter_checks:
-        query_str = "$filter=" + check["Query"]["$filter"]
-        print( "Performing $filter={} on {}".format( query_str, role_collection_uri ) )
+        query_str = "$filter={}".format( check["Query"]["$filter"] )
+        print( "Performing {} on {}".format( query_str, role_collection_uri ) )
         filter_list = redfish_obj.get( role_collection_uri, args = check["Query"] )
         redfish_utilities.verify_response( filter_list )
         filter_count = len( filter_list.dict["Members"] )
@@ -87,14 +122,15 @@ def filter_test( redfish_obj, service_root, results ):
             results.update_test_results( "Filter Check", 0, None )
 
     # Perform a $filter query on an individual role and ensure the request is rejected
-    query = { "$filter": "Id eq '" + role_first.dict["Id"] + "'" }
-    query_str = "$filter=" + query["$filter"]
+    query = { "$filter": match_first }
+    query_str = "$filter={}".format( match_first )
     print( "Performing {} on {}".format( query_str, role_first_uri ) )
     filter_response = redfish_obj.get( role_first_uri, args = query )
     try:
         redfish_utilities.verify_response( filter_response )
         results.update_test_results( "Filter Check", 1, "Query ({}) expected to result in an error, but succeeded.".format( query_str ) )
-    except:
+    except Exception:
+        # verify_response raises when the service rejects the query, which is the expected outcome
         results.update_test_results( "Filter Check", 0, None )
 
 def select_test( redfish_obj, service_root, results ):
@@ -111,18 +147,18 @@ def select_test( redfish_obj, service_root, results ):
     if "AccountService" not in service_root.dict:
         results.update_test_results( "Select Check", 0, "Account service not found for testing.", skipped = True )
         return
-    account_service = redfish_obj.get( service_root.dict["AccountService"]["@odata.id"] )
+    account_service = get_resource( redfish_obj, service_root.dict["AccountService"]["@odata.id"] )
     if "Roles" not in account_service.dict:
         results.update_test_results( "Select Check", 0, "Role collection not found for testing.", skipped = True )
         return
-    role_collection = redfish_obj.get( account_service.dict["Roles"]["@odata.id"] )
+    role_collection = get_resource( redfish_obj, account_service.dict["Roles"]["@odata.id"] )
     role_count = len( role_collection.dict["Members"] )
     if role_count == 0:
         results.update_test_results( "Select Check", 0, "Role collection is empty.", skipped = True )
         return
 
     # Get the first role to be used for $select testing
-    role_first = redfish_obj.get( role_collection.dict["Members"][0]["@odata.id"] )
+    role_first = get_resource( redfish_obj, role_collection.dict["Members"][0]["@odata.id"] )
     role_first_uri = role_first.dict["@odata.id"]
 
     # Perform the query
@@ -133,29 +169,21 @@ def select_test( redfish_obj, service_root, results ):
     redfish_utilities.verify_response( select_response )
 
     # Check the response for the expected properties
-    required_properties = [ "@odata.id", "@odata.type", "Name", "AssignedPrivileges" ]
-    optional_properties = [ "@odata.context", "@odata.etag" ]
     select_dict = select_response.dict
-    for required in required_properties:
-        if required not in select_dict:
-            results.update_test_results( "Select Check", 1, "Query ({}) response expected to contain property {}.".format( query_str, required ) )
+    role_dict = role_first.dict
+    expected_properties = SELECT_REQUIRED_PROPERTIES + tuple( optional for optional in SELECT_OPTIONAL_PROPERTIES if optional in role_dict )
+    for expected in expected_properties:
+        if expected not in select_dict:
+            results.update_test_results( "Select Check", 1, "Query ({}) response expected to contain property {}.".format( query_str, expected ) )
             return
-        if select_dict[required] != role_first.dict[required]:
-            results.update_test_results( "Select Check", 1, "Query ({}) response contains different property value for {}.".format( query_str, required ) )
-            return
-        select_dict.pop( required )
-    for optional in optional_properties:
-        if optional in select_dict and optional in role_first.dict:
-            if select_dict[optional] != role_first.dict[optional]:
-                results.update_test_results( "Select Check", 1, "Query ({}) response contains different property value for {}.".format( query_str, optional ) )
-                return
-            select_dict.pop( optional )
-        elif optional not in select_dict and optional in role_first.dict:
-            results.update_test_results( "Select Check", 1, "Query ({}) response expected to contain property {}.".format( query_str, optional ) )
+        if select_dict[expected] != role_dict[expected]:
+            results.update_test_results( "Select Check", 1, "Query ({}) response contains different property value for {}.".format( query_str, expected ) )
             return
+    expected_set = frozenset( expected_properties )
     for extra in select_dict:
-        results.update_test_results( "Select Check", 1, "Query ({}) response contains extra property {}.".format( query_str, extra ) )
-        return
+        if extra not in expected_set:
+            results.update_test_results( "Select Check", 1, "Query ({}) response contains extra property {}.".format( query_str, extra ) )
+            return
 
     results.update_test_results( "Select Check", 0, None )
 
@@ -203,35 +231,43 @@ def expand_test( redfish_obj, service_root, results ):
         { "Term": "Links", "Query": { "$expand": "~($levels=1)" }, "Sub": False, "Links": True, "Levels": True }
     ]
 
-    # Go through each of the different expand types
-    check_uri = "/redfish/v1/"
+    # Determine which of the expand types can be tested before issuing any queries
+    expand_query = service_root.dict["ProtocolFeaturesSupported"]["ExpandQuery"]
+    supported_terms = frozenset( check["Term"] for check in expand_checks if expand_query.get( check["Term"], False ) )
+    levels_supported = expand_query.get( "Levels", False )
+    active_checks = []
     for check in expand_checks:
-        if not service_root.dict["ProtocolFeaturesSupported"]["ExpandQuery"].get( check["Term"], False ):
+        if check["Term"] not in supported_terms:
             results.update_test_results( "Expand Check", 0, "{} not supported.".format( check["Term"] ), skipped = True )
-            continue
-
-        if not service_root.dict["ProtocolFeaturesSupported"]["ExpandQuery"].get( "Levels", False ) and check["Levels"]:
-            results.update_test_results( "Expand Check", 0, "Levels not supported on $expand".format( check["Term"] ), skipped = True )
-            continue
+        elif check["Levels"] and not levels_supported:
+            results.update_test_results( "Expand Check", 0, "Levels not supported on $expand", skipped = True )
+        else:
+            active_checks.append( check )
 
+    # Go through each of the supported expand types
+    check_uri = "/redfish/v1/"
+    for check in active_checks:
         # Perform the query on service root
         print( "Performing $expand={} on {}".format( check["Query"]["$expand"], check_uri ) )
         expand_response = redfish_obj.get( check_uri, args = check["Query"] )
         redfish_utilities.verify_response( expand_response )
 
         # Check the response to ensure things are expanded properly
-        for property in expand_response.dict:
+        query = check["Query"]
+        expand_links = check["Links"]
+        expand_sub = check["Sub"]
+        for property, value in expand_response.dict.items():
             if property == "Links":
                 # Links object; scan it for expansion
-                for link_property in expand_response.dict[property]:
-                    if isinstance( expand_response.dict[property][link_property], dict ):
-                        verify_expand( results, check["Query"], link_property, expand_response.dict[property][link_property], check["Links"] )
-                    elif isinstance( expand_response.dict[property][link_property], list ):
-                        for link_item in expand_response.dict[property][link_property]:
-                            verify_expand( results, check["Query"], link_property, link_item, check["Links"] )
-            elif isinstance( expand_response.dict[property], dict ):
+                for link_property, link_value in value.items():
+                    if isinstance( link_value, dict ):
+                        verify_expand( results, query, link_property, link_value, expand_links )
+                    elif isinstance( link_value, list ):
+                        for link_item in link_value:
+                            verify_expand( results, query, link_property, link_item, expand_links )
+            elif isinstance( value, dict ):
                 # Non-Links object; check if this is a reference object and if it was expanded properly
-                verify_expand( results, check["Query"], property, expand_response.dict[property], check["Sub"] )
+                verify_expand( results, query, property, value, expand_sub )
 
 def only_test( redfish_obj, service_root, results ):
     """
@@ -266,17 +302,23 @@ def only_test( redfish_obj, service_root, results ):
             print( "Performing {} on {}".format( query_str, check_uri ) )
             only_response = redfish_obj.get( check_uri, args = query )
             redfish_utilities.verify_response( only_response )
-            resource_response = redfish_obj.get( check_uri )
+            only_dict = only_response.dict
+            if "Members" in only_dict and len( only_dict["Members"] ) != 1 and only_dict["@odata.id"] == check_uri:
+                # Query response is the collection itself and the collection does not have exactly one member; no need to read the collection again
+                results.update_test_results( "Only Check", 0, None )
+                continue
+            resource_response = get_resource( redfish_obj, check_uri )
             redfish_utilities.verify_response( resource_response )
-            if len( resource_response.dict["Members"] ) == 1:
+            resource_dict = resource_response.dict
+            if len( resource_dict["Members"] ) == 1:
                 # Collection has exactly one member; query response is supposed to be the one member
-                if only_response.dict["@odata.id"] == resource_response.dict["Members"][0]["@odata.id"]:
+                if only_dict["@odata.id"] == resource_dict["Members"][0]["@odata.id"]:
                     results.update_test_results( "Only Check", 0, None )
                 else:
                     results.update_test_results( "Only Check", 1, "Query ({}) response for {} expected the only collection member.".format( query_str, check_uri ) )
             else:
                 # Collection does not have exactly one member; query response is supposed to be the collection itself
-                if only_response.dict["@odata.id"] != resource_response.dict["@odata.id"] or "Members" not in only_response.dict:
+                if only_dict["@odata.id"] != resource_dict["@odata.id"] or "Members" not in only_dict:
                     results.update_test_results( "Only Check", 1, "Query ({}) response for {} expected the collection itself.".format( query_str, check_uri ) )
                 else:
                     results.update_test_results( "Only Check", 0, None )
@@ -287,7 +329,8 @@ def only_test( redfish_obj, service_root, results ):
             try:
                 redfish_utilities.verify_response( only_response )
                 results.update_test_results( "Only Check", 1, "Query ({}) expected to result in an error for {}, but succeeded.".format( query_str, check_uri ) )
-            except:
+            except Exception:
+                # verify_response raises when the service rejects the query, which is the expected outcome
                 results.update_test_results( "Only Check", 0, None )
 
 if __name__ == '__main__':
@@ -319,8 +362,9 @@ if __name__ == '__main__':
         if args.directory is not None:
             results.set_output_dir( args.directory )
 
-        if "ProtocolFeaturesSupported" in service_root.dict:
-            if service_root.dict["ProtocolFeaturesSupported"].get( "FilterQuery", False ):
+        protocol_features = service_root.dict.get( "ProtocolFeaturesSupported" )
+        if protocol_features is not None:
+            if protocol_features.get( "FilterQuery", False ):
                 try:
                     filter_test( redfish_obj, service_root, results )
                 except Exception as err:
@@ -328,7 +372,7 @@ if __name__ == '__main__':
             else:
                 results.update_test_results( "Filter Check", 0, "Service does not support $filter.", skipped = True )
 
-            if service_root.dict["ProtocolFeaturesSupported"].get( "SelectQuery", False ):
+            if protocol_features.get( "SelectQuery", False ):
                 try:
                     select_test( redfish_obj, service_root, results )
                 except Exception as err:
@@ -336,7 +380,7 @@ if __name__ == '__main__':
             else:
                 results.update_test_results( "Select Check", 0, "Service does not support $select.", skipped = True )
 
-            if "ExpandQuery" in service_root.dict["ProtocolFeaturesSupported"]:
+            if "ExpandQuery" in protocol_features:
                 try:
                     expand_test( redfish_obj, service_root, results )
                 except Exception as err:
@@ -344,7 +388,7 @@ if __name__ == '__main__':
             else:
                 results.update_test_results( "Expand Check", 0, "Service does not support $expand.", skipped = True )
 
-            if service_root.dict["ProtocolFeaturesSupported"].get( "OnlyMemberQuery", False ):
+            if protocol_features.get( "OnlyMemberQuery", False ):
                 try:
                     only_test( redfish_obj, service_root, results )
                 except Exception as err:
@@ -15,30 +15,28 @@ class Results(object):
         self.results_filename = "results.json"
         self.tool_name = tool_name
         self.return_code = 0
-        self.results = {"ToolName": tool_name}
-        self.results.update({"Timestamp": {"DateTime":
-                            "{:%Y-%m-%dT%H:%M:%SZ}".format(datetime.datetime.now(datetime.timezone.utc))}})
-        if service_root is not None:
-            self.results.update({"ServiceRoot": service_root})
-        else:
-            self.results.update({"ServiceRoot": {}})
+        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.results = {
+            "ToolName": tool_name,
+            "Timestamp": {"DateTime": timestamp},
+            "ServiceRoot": service_root if service_root is not None else {}
+        }
 
     def update_test_results(self, test_name, rc, msg, skipped=False):
-        if "TestResults" not in self.results:
-            self.results.update({"TestResults": {}})
-        if test_name not in self.results["TestResults"]:
-            self.results["TestResults"].update({test_name: {"pass": 0, "fail": 0, "skip": 0}})
+        test_results = self.results.setdefault("TestResults", {})
+        counts = test_results.get(test_name)
+        if counts is None:
+            counts = test_results[test_name] = {"pass": 0, "fail": 0, "skip": 0}
         if skipped:
-            self.results["TestResults"][test_name]["skip"] += 1
+            counts["skip"] += 1
         elif rc == 0:
-            self.results["TestResults"][test_name]["pass"] += 1
+            counts["pass"] += 1
         else:
             print("ERROR: {}".format(msg))
-            self.results["TestResults"][test_name]["fail"] += 1
-            if "ErrorMessages" not in self.results["TestResults"]:
-                self.results["TestResults"].update({"ErrorMessages": []})
+            counts["fail"] += 1
+            error_messages = test_results.setdefault("ErrorMessages", [])
             if msg is not None:
-                self.results["TestResults"]["ErrorMessages"].append(test_name + ": " + msg)
+                error_messages.append(test_name + ": " + msg)
             self.return_code = rc
 
     def add_cmd_line_args(self, args):
@@ -47,8 +45,7 @@ class Results(object):
     def set_output_dir(self, output_dir):
         self.output_dir = os.path.abspath(output_dir)
         try:
-            if not os.path.isdir(self.output_dir):
-                os.mkdir(self.output_dir)
+            os.makedirs(self.output_dir, exist_ok=True)
         except OSError as e:
             print("Error creating output directory {}, error: {}".format(self.output_dir, e), file=sys.stderr)
             print("Will write results file to current working directory instead.", file=sys.stderr)
@@ -56,13 +53,15 @@ class Results(object):
 
     def write_results(self):
         path = os.path.join(self.output_dir, self.results_filename)
+        # encode in one pass and write once rather than letting json.dump write each chunk separately
+        data = json.dumps(self.results, indent=4)
         try:
             with open(path, 'w') as outfile:
-                json.dump(self.results, outfile, indent=4)
+                outfile.write(data)
         except OSError as e:
             print("Error writing results file to {}, error: {}".format(path, e), file=sys.stderr)
             print("Printing results to STDOUT instead.", file=sys.stderr)
-            print(json.dumps(self.results, indent=4))
+            print(data)
 
     def json_string(self):
         return json.dumps(self.results)
@@ -2,10 +2,42 @@
 # Copyright 2017 Distributed Management Task Force, Inc. All rights reserved.
 # License: BSD 3-Clause License. For full text see link: https://github.com/DMTF/Redfish-Usecase-Checkers/blob/main/LICENSE.md
 
+import functools
 import jsonschema
 import logging
 import requests
 
+# Validators built for each schema, keyed by the schema's $id; building a validator checks the schema itself, so this is only done once per schema
+_validator_cache = {}
+
+
+def _get_validator(schema):
+    """
+    Get a validator for the schema, building and caching it if needed
+    """
+    schema_id = schema.get("$id") if isinstance(schema, dict) else None
+    if schema_id is not None and schema_id in _validator_cache:
+        return _validator_cache[schema_id]
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    validator = cls(schema)
+    if schema_id is not None:
+        _validator_cache[schema_id] = validator
+    return validator
+
+
+@functools.lru_cache(maxsize=256)
+def _split_odata_type(odata_type):
+    """
+    Split an @odata.type value into namespace and type; the same types recur across payloads, so results are cached
+    """
+    ns, dot, type_name = odata_type.rpartition('.')
+    if not dot:
+        return None, None
+    if ns.startswith('#'):
+        ns = ns[1:]
+    return ns, type_name
+
 
 class SchemaValidation(object):
 
@@ -13,19 +45,26 @@ class SchemaValidation(object):
         self.service_root = service_root
         self.results = results
         self.schema_dict = None
+        # Schemas already fetched, keyed by the URI of their JsonSchemas entry
+        self.schema_cache = {}
         self.rhost = rhost
         self.auth = auth
         self.verify = verify
         self.nossl = nossl
         self.proto = 'http' if nossl else 'https'
+        # keep one session for all schema fetches so the connection to the service is reused
+        self.session = requests.Session()
+        self.session.auth = auth
+        # requests treats verify=None per call as the default (verify certificates), but None on the session disables verification
+        self.session.verify = True if verify is None else verify
         # get /redfish/v1/JSONSchemas collection and store it as a dict
         if service_root is not None and "JsonSchemas" in service_root and "@odata.id" in service_root["JsonSchemas"]:
             json_schema_uri = service_root["JsonSchemas"]["@odata.id"]
-            logging.info("SchemaValidation:__init__: json_schema_uri = {}".format(json_schema_uri))
+            logging.info("SchemaValidation:__init__: json_schema_uri = %s", json_schema_uri)
             schemas = self.get_resource(json_schema_uri)
             if schemas is not None and "Members" in schemas:
                 self.schema_dict = {elt["@odata.id"].rsplit("/", 1)[1]: elt["@odata.id"] for elt in schemas["Members"]}
-                logging.debug("SchemaValidation:__init__: schema_dict = {}".format(self.schema_dict))
+                logging.debug("SchemaValidation:__init__: schema_dict = %s", self.schema_dict)
             else:
                 logging.warning("SchemaValidation:__init__: unable to read schema Members")
         else:
@@ -33,21 +72,22 @@ class SchemaValidation(object):
 
     def get_resource(self, uri):
         name = uri.split('/')[-1]
-        logging.debug("get_resource: Getting {} resource with uri {}".format(name, uri))
+        logging.debug("get_resource: Getting %s resource with uri %s", name, uri)
         try:
-            r = requests.get(self.proto + '://' + self.rhost + uri, auth=self.auth, verify=self.verify)
-            if r.status_code == requests.codes.ok:
-                d = r.json()
-                if d is not None:
-                    logging.debug("get_resource: {} resource: {}".format(name, d))
-                    return d
+            # close the response once it is read so the connection goes back to the session's pool right away
+            with self.session.get(self.proto + '://' + self.rhost + uri) as r:
+                if r.status_code == requests.codes.ok:
+                    d = r.json()
+                    if d is not None:
+                        logging.debug("get_resource: %s resource: %s", name, d)
+                        return d
+                    else:
+                        logging.error("get_resource: No JSON content for %s found in response", uri)
                 else:
-                    logging.error("get_resource: No JSON content for {} found in response".format(uri))
-            else:
-                logging.error("get_resource: Received unexpected response for resource {}: {}".format(name, r))
+                    logging.error("get_resource: Received unexpected response for resource %s: %s", name, r)
             return None
         except requests.exceptions.RequestException as e:
-            logging.error("get_resource: Exception received while tying to fetch uri {}, error = {}".format(uri, e))
+            logging.error("get_resource: Exception received while tying to fetch uri %s, error = %s", uri, e)
             return None
 
     @staticmethod
@@ -58,10 +98,9 @@ class SchemaValidation(object):
         ns = type_name = None
         if json_data is not None and "@odata.type" in json_data:
             odata_type = json_data["@odata.type"]
-            ns, type_name = odata_type.rsplit('.', 1)
-            ns = ns.strip('#')
-            logging.info("SchemaValidation:split_odata_type: odata = {}, namespace = {}, typename = {}"
-                         .format(odata_type, ns, type_name))
+            ns, type_name = _split_odata_type(odata_type)
+            logging.info("SchemaValidation:split_odata_type: odata = %s, namespace = %s, typename = %s",
+                         odata_type, ns, type_name)
         else:
             logging.info("SchemaValidation:split_odata_type: JSON payload empty or no @odata.type found")
         return ns, type_name
@@ -78,22 +117,23 @@ class SchemaValidation(object):
         if ns is None:
             logging.error("SchemaValidation:get_json_schema: No '@odata.type' found in JSON payload")
             return None
-        data = uri = None
-        if ns is not None and ns in self.schema_dict:
-            uri = self.schema_dict[ns]
-        elif type_name is not None and type_name in self.schema_dict:
-            uri = self.schema_dict[type_name]
+        data = None
+        # the namespace is the usual key; only fall back to the type name when it is not found
+        uri = self.schema_dict.get(ns) or self.schema_dict.get(type_name)
         if uri is not None:
+            if uri in self.schema_cache:
+                return self.schema_cache[uri]
             data = self.get_resource(uri)
         if data is not None and "Location" in data:
             location = data["Location"]
             if len(location) > 0 and "Uri" in location[0]:
-                uri = location[0]["Uri"]
-                schema = self.get_resource(uri)
+                schema = self.get_resource(location[0]["Uri"])
+                if schema is not None:
+                    self.schema_cache[uri] = schema
             else:
                 logging.error("SchemaValidation:get_json_schema: 'Uri' not found in Location[0]")
         else:
-            logging.error("SchemaValidation:get_json_schema: 'Location' not found from uri {}".format(uri))
+            logging.error("SchemaValidation:get_json_schema: 'Location' not found from uri %s", uri)
         return schema
 
     @staticmethod
@@ -111,14 +151,16 @@ class SchemaValidation(object):
             return 0, None
         # validate the json response against the schema
         try:
-            logging.debug("SchemaValidation:validate_json: JSON to be validated: {}".format(json_data))
-            logging.debug("SchemaValidation:validate_json: JSON schema for validation: {}".format(schema))
-            jsonschema.validate(json_data, schema)
+            logging.debug("SchemaValidation:validate_json: JSON to be validated: %s", json_data)
+            logging.debug("SchemaValidation:validate_json: JSON schema for validation: %s", schema)
+            error = jsonschema.exceptions.best_match(_get_validator(schema).iter_errors(json_data))
+            if error is not None:
+                raise error
         except jsonschema.ValidationError as e:
-            logging.error("SchemaValidation:validate_json: JSON schema validation error: {}".format(e.message))
+            logging.error("SchemaValidation:validate_json: JSON schema validation error: %s", e.message)
             return 4, e.message
         except jsonschema.SchemaError as e:
-            logging.error("SchemaValidation:validate_json: JSON schema error: {}".format(e.message))
+            logging.error("SchemaValidation:validate_json: JSON schema error: %s", e.message)
             return 8, e.message
         else:
             logging.info("SchemaValidation:validate_json: JSON schema validation successful")